@@ -75,7 +75,7 @@ async def health_check():
     Health check endpoint
     """
     try:
-        health_status = qa_service.get_health_status()
+        health_status = await qa_service.get_health_status()
         
         if health_status["overall"] == "healthy":
             return JSONResponse(
@@ -20,6 +20,28 @@ class Settings(BaseSettings):
     
     # Vector Search
     TOP_K_CHUNKS: int = 5  # number of chunks to retrieve for context
+    MAX_CONTEXT_WORDS: int = 8000  # budget for one context shared by all questions of a request
+    
+    # Document Cache
+    INDEX_CACHE_SIZE: int = 8  # document search indexes kept in memory
+    DOCUMENT_CACHE_DIR: str = ""  # e.g. ".cache/documents"; on-disk cache shared by workers, costs a HEAD request per new document
+    DOCUMENT_CACHE_MAX_ENTRIES: int = 256  # documents kept on disk
+    
+    # Gemini
+    MAX_CONCURRENCY: int = 5  # max concurrent Gemini calls per worker
+    HEALTH_CHECK_TTL: int = 30  # seconds a Gemini health probe result is reused
+    
+    # Answer Cache
+    ANSWER_CACHE_SIZE: int = 1024  # max cached answers across all documents
+    ANSWER_CACHE_TTL: int = 300  # seconds; kept short since entries are not tied to the document version
+    
+    # Server
+    WORKERS: int = int(os.getenv("UVICORN_WORKERS", "1"))  # worker processes for `python main.py`
+    
+    # LLM Response Cache
+    LLM_CACHE_ENABLED: bool = True  # set False to always call Gemini
+    LLM_CACHE_SIZE: int = 1024  # max cached responses
+    LLM_CACHE_FILE: str = ""  # e.g. ".cache/llm_responses.jsonl"; empty keeps the cache in memory only
     
     # Response Configuration
     MAX_QUESTIONS: int = 10
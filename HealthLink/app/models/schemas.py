@@ -1,7 +1,17 @@
+from dataclasses import dataclass
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional
 import re
 
+# Basic URL validation
+_URL_RE = re.compile(
+    r'^https?://'  # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
+    r'localhost|'  # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
+    r'(?::\d+)?'  # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
 class QARequest(BaseModel):
     documents: str = Field(..., description="Public URL to PDF document")
     questions: List[str] = Field(..., min_length=1, max_length=10, description="List of questions to answer")
@@ -11,22 +21,8 @@ class QARequest(BaseModel):
         if not v or not isinstance(v, str):
             raise ValueError("Document URL is required and must be a string")
         
-        # Basic URL validation
-        url_pattern = re.compile(
-            r'^https?://'  # http:// or https://
-            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
-            r'localhost|'  # localhost...
-            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-            r'(?::\d+)?'  # optional port
-            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-        
-        if not url_pattern.match(v):
+        if not _URL_RE.match(v):
             raise ValueError("Invalid URL format")
-        
-        # Check if URL points to a PDF (optional, as some URLs might not have .pdf extension)
-        if not (v.lower().endswith('.pdf') or 'pdf' in v.lower()):
-            # Allow it but log a warning
-            pass
             
         return v
     
@@ -55,8 +51,10 @@ class ErrorResponse(BaseModel):
     details: Optional[str] = Field(None, description="Additional error details")
     status_code: int = Field(..., description="HTTP status code")
 
-class DocumentChunk(BaseModel):
+# Internal only, never sent over the wire: a plain slotted dataclass avoids
+# pydantic validation for the hundreds of chunks built per document
+@dataclass(slots=True)
+class DocumentChunk:
     content: str
     chunk_id: int
     page_number: Optional[int] = None
-    embedding: Optional[List[float]] = None
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import List, Optional, Tuple
+from app.models.schemas import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+def document_key(url: str) -> str:
+    """
+    Namespace key for a document URL
+    """
+    return hashlib.sha256(url.encode()).hexdigest()
+
+def _normalize_question(question: str) -> str:
+    """
+    Normalize a question for exact matching: lowercase, with whitespace collapsed
+    """
+    return ' '.join(question.lower().split())
+
+class AnswerCache:
+    """
+    In-memory cache of answers per document, keyed by the exact normalized
+    question, with TTL expiry and LRU eviction.
+    """
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Tuple[str, str], Tuple[str, float]] = OrderedDict()
+    
+    def get(self, document_url: str, question: str) -> Optional[str]:
+        """
+        Return the cached answer for the same question on the same document
+        """
+        key = (document_key(document_url), _normalize_question(question))
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        if time.monotonic() - entry[1] > self.ttl:
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        logger.info("Answer cache hit")
+        return entry[0]
+    
+    def put(self, document_url: str, question: str, answer: str) -> None:
+        """
+        Store an answer, evicting the least recently used entries beyond max_size
+        """
+        key = (document_key(document_url), _normalize_question(question))
+        self._entries[key] = (answer, time.monotonic())
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+class ResponseCache:
+    """
+    Exact-match cache of LLM responses keyed by SHA-256 of the full prompt.
+    Optionally persisted to a JSON-lines file so it survives restarts.
+    """
+    
+    def __init__(self, max_size: int, path: str = ""):
+        self.max_size = max_size
+        self.path = path
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._file_lock = threading.Lock()
+        
+        if self.path:
+            self._load()
+    
+    def get(self, prompt: str) -> Optional[str]:
+        """
+        Return the cached response for an identical prompt
+        """
+        key = hashlib.sha256(prompt.encode()).hexdigest()
+        response = self._entries.get(key)
+        
+        if response is not None:
+            self._entries.move_to_end(key)
+            logger.info("LLM response cache hit")
+        return response
+    
+    async def put(self, prompt: str, response: str) -> None:
+        """
+        Store a response, appending it to the cache file (off the event loop) when persistence is enabled
+        """
+        key = hashlib.sha256(prompt.encode()).hexdigest()
+        self._store(key, response)
+        
+        if self.path:
+            await asyncio.to_thread(self._append, key, response)
+    
+    def _store(self, key: str, response: str) -> None:
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def _load(self) -> None:
+        """
+        Load persisted responses, compacting the file down to the entries that fit in the cache
+        """
+        if not os.path.exists(self.path):
+            return
+        
+        line_count = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line_count += 1
+                try:
+                    record = json.loads(line)
+                    self._store(record["key"], record["response"])
+                except (ValueError, KeyError):
+                    logger.warning("Skipping malformed line in LLM response cache file")
+        
+        if line_count > len(self._entries):
+            self._compact()
+        
+        logger.info(f"Loaded {len(self._entries)} cached LLM responses from {self.path}")
+    
+    def _compact(self) -> None:
+        """
+        Rewrite the cache file with only the loaded entries. Written to a temporary file
+        and renamed into place, so other workers never read a truncated file.
+        """
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        
+        try:
+            with self._file_lock:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    for key, response in self._entries.items():
+                        f.write(json.dumps({"key": key, "response": response}) + "\n")
+                os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to compact LLM response cache file: {str(e)}")
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+    
+    def _append(self, key: str, response: str) -> None:
+        # Persistence is best effort: a disk error must not fail the request
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            with self._file_lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "response": response}) + "\n")
+        except OSError as e:
+            logger.warning(f"Failed to persist LLM response: {str(e)}")
+
+class DocumentStore:
+    """
+    On-disk cache of processed document chunks, keyed by document URL and validated
+    against the server's ETag / Last-Modified header. Shared by all workers, and capped
+    at max_entries documents, evicting the least recently used.
+    """
+    
+    def __init__(self, directory: str, max_entries: int):
+        self.directory = directory
+        self.max_entries = max_entries
+    
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, f"{document_key(url)}.json")
+    
+    def load(self, url: str, validator: str) -> Optional[List[DocumentChunk]]:
+        """
+        Load the stored chunks for a document if they were saved for the same validator
+        """
+        path = self._path(url)
+        try:
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+            
+            if record.get("validator") != validator:
+                return None
+            
+            chunks = [DocumentChunk(**chunk) for chunk in record["chunks"]]
+            # Mark the entry as recently used for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable document cache entry: {str(e)}")
+            return None
+        
+        logger.info(f"Loaded {len(chunks)} chunks from document cache")
+        return chunks
+    
+    def save(self, url: str, validator: str, chunks: List[DocumentChunk]) -> None:
+        """
+        Store the chunks for a document. Written to a temporary file and renamed into
+        place, so concurrent workers never read a partial entry.
+        """
+        path = self._path(url)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "validator": validator,
+                    "chunks": [asdict(chunk) for chunk in chunks]
+                }, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to save document cache entry: {str(e)}")
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return
+        
+        self._evict()
+    
+    def _evict(self) -> None:
+        """
+        Remove the least recently used entries beyond max_entries
+        """
+        try:
+            entries = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        entries.append((entry.stat().st_mtime, entry.path))
+            
+            entries.sort()
+            for _, path in entries[:max(len(entries) - self.max_entries, 0)]:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass  # another worker evicted it first
+        except OSError as e:
+            logger.warning(f"Failed to evict document cache entries: {str(e)}")
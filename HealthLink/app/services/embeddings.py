@@ -1,97 +1,167 @@
+import heapq
 import logging
-from typing import List
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
 from app.models.schemas import DocumentChunk
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=1024)
+def _query_words(query: str) -> FrozenSet[str]:
+    """
+    Tokenize a search query. Cached because the same questions recur across requests.
+    """
+    return frozenset(query.lower().split())
+
+@dataclass(slots=True)
+class KeywordIndex:
+    """
+    Text search index over the chunks of one document
+    """
+    chunks: List[DocumentChunk]
+    postings: Dict[str, List[int]]  # word -> positions of the chunks containing it
+
 class EmbeddingService:
     """
     Handles text search using simple text matching (simplified for disk space constraints)
     """
     
-    def __init__(self):
-        self.chunks = []
+    def __init__(self, max_indexes: int = 8):
+        self.max_indexes = max_indexes
+        # Live indexes keyed by document, least recently used first. An index is never
+        # modified once built, so concurrent requests can read it without clearing it.
+        self._indexes: OrderedDict[str, KeywordIndex] = OrderedDict()
     
-    def create_vector_index(self, chunks: List[DocumentChunk]) -> None:
+    def get_index(self, key: str) -> Optional[KeywordIndex]:
         """
-        Store document chunks for text-based search
+        Return the live index for a document, if it is still cached
         """
-        try:
-            logger.info(f"Storing {len(chunks)} chunks for text search")
-            self.chunks = chunks
-            logger.info("Text search index created")
-            
-        except Exception as e:
-            logger.error(f"Failed to create text index: {str(e)}")
-            raise ValueError(f"Failed to create text index: {str(e)}")
+        index = self._indexes.get(key)
+        if index is not None:
+            self._indexes.move_to_end(key)
+        return index
     
-    def search_similar_chunks(self, query: str, top_k: int = 5) -> List[DocumentChunk]:
+    def create_vector_index(self, key: str, chunks: List[DocumentChunk]) -> KeywordIndex:
+        """
+        Build the text search index for a document and keep it live, evicting
+        the least recently used indexes beyond max_indexes
+        """
+        logger.info(f"Storing {len(chunks)} chunks for text search")
+        
+        # Build an inverted index: word -> positions of the chunks containing it
+        postings = {}
+        for position, chunk in enumerate(chunks):
+            for word in set(chunk.content.lower().split()):
+                postings.setdefault(word, []).append(position)
+        
+        index = KeywordIndex(chunks=chunks, postings=postings)
+        self._indexes[key] = index
+        self._indexes.move_to_end(key)
+        while len(self._indexes) > self.max_indexes:
+            self._indexes.popitem(last=False)
+        
+        logger.info("Text search index created")
+        return index
+    
+    def search_similar_chunks(self, index: KeywordIndex, query: str, top_k: int = 5) -> List[DocumentChunk]:
         """
         Search for similar chunks using keyword matching
         """
-        try:
-            if not self.chunks:
-                raise ValueError("Text index not initialized. Create index first.")
-            
-            logger.info(f"Searching for top {top_k} similar chunks using keyword matching")
-            
-            # Simple keyword-based search
-            query_words = set(query.lower().split())
-            scored_chunks = []
-            
-            for chunk in self.chunks:
-                chunk_words = set(chunk.content.lower().split())
-                # Calculate simple overlap score
-                overlap = len(query_words.intersection(chunk_words))
-                if overlap > 0:
-                    scored_chunks.append((chunk, overlap))
-            
-            # Sort by score and return top_k
-            scored_chunks.sort(key=lambda x: x[1], reverse=True)
-            similar_chunks = [chunk for chunk, score in scored_chunks[:top_k]]
-            
-            # If not enough keyword matches, add remaining chunks
-            if len(similar_chunks) < top_k:
-                used_chunk_ids = {chunk.chunk_id for chunk in similar_chunks}
-                for chunk in self.chunks:
-                    if chunk.chunk_id not in used_chunk_ids and len(similar_chunks) < top_k:
-                        similar_chunks.append(chunk)
-            
-            logger.info(f"Found {len(similar_chunks)} similar chunks")
-            return similar_chunks[:top_k]
-            
-        except Exception as e:
-            logger.error(f"Failed to search similar chunks: {str(e)}")
-            raise ValueError(f"Failed to search similar chunks: {str(e)}")
+        if not index.chunks:
+            raise ValueError("Text index is empty")
+        
+        logger.info(f"Searching for top {top_k} similar chunks using keyword matching")
+        
+        # Simple keyword-based search
+        query_words = _query_words(query)
+        
+        # Walk the posting lists of the query words; only chunks sharing a word get a score
+        scores = Counter()
+        for word in query_words:
+            scores.update(index.postings.get(word, ()))
+        
+        # Select the top_k matching chunks by score (ties keep document order)
+        # without sorting every match
+        ranked = heapq.nsmallest(top_k, scores, key=lambda i: (-scores[i], i))
+        similar_chunks = [index.chunks[i] for i in ranked]
+        
+        # If not enough keyword matches, add remaining chunks
+        if len(similar_chunks) < top_k:
+            used_chunk_ids = {chunk.chunk_id for chunk in similar_chunks}
+            for chunk in index.chunks:
+                if chunk.chunk_id not in used_chunk_ids and len(similar_chunks) < top_k:
+                    similar_chunks.append(chunk)
+        
+        logger.info(f"Found {len(similar_chunks)} similar chunks")
+        return similar_chunks[:top_k]
     
-    def get_context_for_question(self, question: str, top_k: int = 5) -> str:
+    def get_context_for_question(self, index: KeywordIndex, question: str, top_k: int = 5) -> str:
         """
         Get relevant context for a question by combining similar chunks
         """
-        try:
-            similar_chunks = self.search_similar_chunks(question, top_k)
-            
-            if not similar_chunks:
-                return "No relevant context found in the document."
-            
-            # Combine chunk contents
-            context_parts = []
-            for i, chunk in enumerate(similar_chunks, 1):
-                page_info = f"[Page {chunk.page_number}]" if chunk.page_number else "[Unknown Page]"
-                context_parts.append(f"{page_info} {chunk.content}")
-            
-            context = "\n\n".join(context_parts)
-            
-            logger.info(f"Generated context from {len(similar_chunks)} chunks")
-            return context
-            
-        except Exception as e:
-            logger.error(f"Failed to get context for question: {str(e)}")
-            raise ValueError(f"Failed to get context for question: {str(e)}")
+        similar_chunks = self.search_similar_chunks(index, question, top_k)
+        return self._format_context(similar_chunks)
+    
+    def _format_context(self, chunks: List[DocumentChunk]) -> str:
+        """
+        Combine chunk contents into a context string, labelled with page numbers
+        """
+        if not chunks:
+            return "No relevant context found in the document."
+        
+        # Combine chunk contents
+        context_parts = []
+        for chunk in chunks:
+            page_info = f"[Page {chunk.page_number}]" if chunk.page_number else "[Unknown Page]"
+            context_parts.append(f"{page_info} {chunk.content}")
+        
+        context = "\n\n".join(context_parts)
+        
+        logger.info(f"Generated context from {len(chunks)} chunks")
+        return context
+    
+    def get_contexts_for_questions(self, index: KeywordIndex, questions: List[str], top_k: int = 5) -> List[str]:
+        """
+        Get relevant context for several questions in one pass, retrieving each distinct question once
+        """
+        # Key by normalized query words: questions differing only in case, spacing or
+        # word order retrieve exactly the same chunks
+        contexts = {}
+        for question in questions:
+            key = _query_words(question)
+            if key not in contexts:
+                contexts[key] = self.get_context_for_question(index, question, top_k)
+        
+        return [contexts[_query_words(question)] for question in questions]
     
-    def clear_index(self):
+    def get_shared_context(self, index: KeywordIndex, questions: List[str], top_k: int = 5, max_words: int = 8000) -> Optional[str]:
         """
-        Clear the current chunks
+        Get a single context covering all questions: the union of each question's top_k chunks,
+        best-ranked first. Returns None if the union is longer than max_words.
         """
-        self.chunks = []
-        logger.info("Text search index cleared")
+        rankings = {}
+        for question in questions:
+            key = _query_words(question)
+            if key not in rankings:
+                rankings[key] = self.search_similar_chunks(index, question, top_k)
+        
+        # Dedupe chunks, keeping the best rank any question gave each one
+        best_rank = {}
+        union = {}
+        for ranked_chunks in rankings.values():
+            for rank, chunk in enumerate(ranked_chunks):
+                if rank < best_rank.get(chunk.chunk_id, top_k):
+                    best_rank[chunk.chunk_id] = rank
+                    union[chunk.chunk_id] = chunk
+        
+        shared_chunks = sorted(union.values(), key=lambda chunk: (best_rank[chunk.chunk_id], chunk.chunk_id))
+        
+        # Chunk text is single-spaced, so counting spaces counts words without splitting
+        total_words = sum(chunk.content.count(' ') + 1 for chunk in shared_chunks)
+        if total_words > max_words:
+            logger.info(f"Shared context of {total_words} words exceeds the {max_words} word budget")
+            return None
+        
+        return self._format_context(shared_chunks)
@@ -1,14 +1,16 @@
-import requests
+import asyncio
+import httpx
 import fitz  # PyMuPDF
 import logging
-import tempfile
-import os
-from typing import List, Tuple
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 from app.models.schemas import DocumentChunk
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+_WORD_RE = re.compile(r'\S+')
+
 class PDFProcessor:
     """
     Handles PDF downloading, text extraction, and chunking
@@ -18,165 +20,175 @@ class PDFProcessor:
         self.chunk_size = settings.CHUNK_SIZE
         self.chunk_overlap = settings.CHUNK_OVERLAP
         self.max_file_size = settings.MAX_FILE_SIZE
+        self._http_client: Optional[httpx.AsyncClient] = None
+    
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """
+        Shared HTTP client, so connections (and their TLS sessions) are reused across downloads
+        """
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                headers={
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+                },
+                timeout=30.0,
+                follow_redirects=True
+            )
+        return self._http_client
+    
+    async def aclose(self) -> None:
+        """
+        Close the shared HTTP client
+        """
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
     
-    async def download_pdf(self, url: str) -> bytes:
+    async def fetch_validator(self, url: str) -> Optional[str]:
+        """
+        Get the document's ETag (or Last-Modified) with a HEAD request, to validate cached copies
+        """
+        try:
+            response = await self._get_http_client().head(url)
+            response.raise_for_status()
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            logger.warning(f"Could not fetch document validator: {str(e)}")
+            return None
+        
+        return response.headers.get('etag') or response.headers.get('last-modified')
+    
+    async def download_pdf(self, url: str) -> bytearray:
         """
         Download PDF from public URL
         """
         try:
             logger.info(f"Downloading PDF from: {url}")
             
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=30, stream=True)
-            response.raise_for_status()
-            
-            # Check content type
-            content_type = response.headers.get('content-type', '').lower()
-            if 'pdf' not in content_type and not url.lower().endswith('.pdf'):
-                logger.warning(f"Content type might not be PDF: {content_type}")
-            
-            # Check file size
-            content_length = response.headers.get('content-length')
-            if content_length and int(content_length) > self.max_file_size:
-                raise ValueError(f"File too large: {content_length} bytes")
-            
-            # Download content
-            pdf_content = b''
-            total_size = 0
-            
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    total_size += len(chunk)
-                    if total_size > self.max_file_size:
-                        raise ValueError(f"File too large: {total_size} bytes")
-                    pdf_content += chunk
+            async with self._get_http_client().stream('GET', url) as response:
+                response.raise_for_status()
+                
+                # Check content type
+                content_type = response.headers.get('content-type', '').lower()
+                if 'pdf' not in content_type and not url.lower().endswith('.pdf'):
+                    logger.warning(f"Content type might not be PDF: {content_type}")
+                
+                # Check file size
+                content_length = response.headers.get('content-length')
+                if content_length and int(content_length) > self.max_file_size:
+                    raise ValueError(f"File too large: {content_length} bytes")
+                
+                # Download content without blocking the event loop
+                pdf_content = bytearray()
+                
+                async for chunk in response.aiter_bytes(chunk_size=65536):
+                    pdf_content.extend(chunk)
+                    if len(pdf_content) > self.max_file_size:
+                        raise ValueError(f"File too large: {len(pdf_content)} bytes")
             
-            logger.info(f"Downloaded PDF: {total_size} bytes")
+            logger.info(f"Downloaded PDF: {len(pdf_content)} bytes")
             return pdf_content
             
-        except requests.exceptions.RequestException as e:
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
             logger.error(f"Failed to download PDF: {str(e)}")
             raise ValueError(f"Failed to download PDF: {str(e)}")
-        except Exception as e:
-            logger.error(f"Unexpected error downloading PDF: {str(e)}")
-            raise ValueError(f"Error downloading PDF: {str(e)}")
     
-    def extract_text_from_pdf(self, pdf_content: bytes) -> List[Tuple[str, int]]:
+    def iter_text_pages(self, pdf_content: Union[bytes, bytearray]) -> Iterator[Tuple[str, int]]:
         """
-        Extract text from PDF content
-        Returns list of (text, page_number) tuples
+        Extract text from PDF content one page at a time
+        Yields (text, page_number) tuples for non-empty pages
         """
+        logger.info("Extracting text from PDF")
+        doc = None
+        
         try:
-            logger.info("Extracting text from PDF")
-            
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(pdf_content)
-                temp_file_path = temp_file.name
-            
-            try:
-                # Open PDF with PyMuPDF
-                doc = fitz.open(temp_file_path)
-                text_pages = []
-                
-                for page_num in range(len(doc)):
-                    page = doc[page_num]
-                    text = page.get_text()
-                    
-                    # Clean up text
-                    text = self._clean_text(text)
-                    
-                    if text.strip():  # Only add non-empty pages
-                        text_pages.append((text, page_num + 1))
+            # Open PDF with PyMuPDF straight from memory. PyMuPDF copies a bytearray
+            # stream into bytes, but reads a memoryview in place
+            doc = fitz.open(stream=memoryview(pdf_content), filetype='pdf')
+            page_count = 0
+            
+            for page_num in range(len(doc)):
+                page = doc[page_num]
+                text = page.get_text()
                 
-                doc.close()
-                logger.info(f"Extracted text from {len(text_pages)} pages")
-                return text_pages
+                # Clean up text
+                text = self._clean_text(text)
                 
-            finally:
-                # Clean up temporary file
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-                    
-        except Exception as e:
+                if text.strip():  # Only yield non-empty pages
+                    page_count += 1
+                    yield text, page_num + 1
+            
+            logger.info(f"Extracted text from {page_count} pages")
+            
+        except RuntimeError as e:  # PyMuPDF raises FileDataError (a RuntimeError) for unreadable PDFs
             logger.error(f"Failed to extract text from PDF: {str(e)}")
             raise ValueError(f"Failed to extract text from PDF: {str(e)}")
+        finally:
+            if doc is not None:
+                doc.close()
     
     def _clean_text(self, text: str) -> str:
         """
         Clean extracted text
         """
-        # Remove excessive whitespace
-        text = ' '.join(text.split())
-        
         # Remove special characters that might interfere
         text = text.replace('\x00', ' ')
         text = text.replace('\ufffd', ' ')
         
-        return text.strip()
+        # Remove excessive whitespace, last so text is single-spaced
+        return ' '.join(text.split())
     
-    def chunk_text(self, text_pages: List[Tuple[str, int]]) -> List[DocumentChunk]:
+    def chunk_text(self, text_pages: Iterable[Tuple[str, int]]) -> List[DocumentChunk]:
         """
         Split text into overlapping chunks
         """
-        try:
-            logger.info("Chunking text into segments")
-            chunks = []
-            chunk_id = 0
-            
-            for text, page_num in text_pages:
-                words = text.split()
+        logger.info("Chunking text into segments")
+        chunks = []
+        chunk_id = 0
+        
+        for text, page_num in text_pages:
+            # Word boundaries as (start, end) offsets; chunks are sliced straight out
+            # of the page text instead of splitting it into words and re-joining them
+            offsets = [match.span() for match in _WORD_RE.finditer(text)]
+            
+            # Create overlapping chunks
+            for i in range(0, len(offsets), self.chunk_size - self.chunk_overlap):
+                window = offsets[i:i + self.chunk_size]
                 
-                # Create overlapping chunks
-                for i in range(0, len(words), self.chunk_size - self.chunk_overlap):
-                    chunk_words = words[i:i + self.chunk_size]
-                    
-                    if len(chunk_words) < 10:  # Skip very small chunks
-                        continue
-                    
-                    chunk_text = ' '.join(chunk_words)
-                    
-                    chunk = DocumentChunk(
-                        content=chunk_text,
-                        chunk_id=chunk_id,
-                        page_number=page_num
-                    )
-                    
-                    chunks.append(chunk)
-                    chunk_id += 1
-            
-            logger.info(f"Created {len(chunks)} text chunks")
-            return chunks
-            
-        except Exception as e:
-            logger.error(f"Failed to chunk text: {str(e)}")
-            raise ValueError(f"Failed to chunk text: {str(e)}")
+                if len(window) < 10:  # Skip very small chunks
+                    continue
+                
+                chunk_text = text[window[0][0]:window[-1][1]]
+                
+                chunk = DocumentChunk(
+                    content=chunk_text,
+                    chunk_id=chunk_id,
+                    page_number=page_num
+                )
+                
+                chunks.append(chunk)
+                chunk_id += 1
+        
+        logger.info(f"Created {len(chunks)} text chunks")
+        return chunks
+    
+    def _extract_and_chunk(self, pdf_content: Union[bytes, bytearray]) -> List[DocumentChunk]:
+        """
+        Chunk the PDF page by page as text is extracted, without collecting all pages first
+        """
+        return self.chunk_text(self.iter_text_pages(pdf_content))
     
     async def process_pdf(self, url: str) -> List[DocumentChunk]:
         """
         Complete PDF processing pipeline
         """
-        try:
-            # Download PDF
-            pdf_content = await self.download_pdf(url)
-            
-            # Extract text
-            text_pages = self.extract_text_from_pdf(pdf_content)
-            
-            if not text_pages:
-                raise ValueError("No text could be extracted from the PDF")
-            
-            # Chunk text
-            chunks = self.chunk_text(text_pages)
-            
-            if not chunks:
-                raise ValueError("No valid chunks could be created from the PDF")
-            
-            return chunks
-            
-        except Exception as e:
-            logger.error(f"PDF processing failed: {str(e)}")
-            raise
+        # Download PDF
+        pdf_content = await self.download_pdf(url)
+        
+        # Extract and chunk in one pass in a worker thread: each page is chunked as soon as
+        # it is extracted, and neither step blocks the event loop
+        chunks = await asyncio.to_thread(self._extract_and_chunk, pdf_content)
+        
+        if not chunks:
+            raise ValueError("No valid chunks could be created from the PDF")
+        
+        return chunks
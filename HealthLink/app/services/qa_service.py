@@ -1,14 +1,22 @@
+import asyncio
+import json
 import logging
-from typing import List
+import re
+import time
+from contextlib import aclosing
+from typing import Dict, List, Optional
 from google import genai
 from google.genai import types
 from app.core.config import settings
 from app.services.pdf_processor import PDFProcessor
-from app.services.embeddings import EmbeddingService
+from app.services.embeddings import EmbeddingService, KeywordIndex
+from app.services.cache import AnswerCache, DocumentStore, ResponseCache, document_key
 from app.models.schemas import QARequest, QAResponse
 
 logger = logging.getLogger(__name__)
 
+_ANSWER_PREFIX_RE = re.compile(r'^\s*answer\s*:\s*', re.IGNORECASE)
+
 class QAService:
     """
     Main service for document question-answering using Gemini Flash 1.5
@@ -16,7 +24,22 @@ class QAService:
     
     def __init__(self):
         self.pdf_processor = PDFProcessor()
-        self.embedding_service = EmbeddingService()
+        self.embedding_service = EmbeddingService(max_indexes=settings.INDEX_CACHE_SIZE)
+        self.document_store = (
+            DocumentStore(settings.DOCUMENT_CACHE_DIR, max_entries=settings.DOCUMENT_CACHE_MAX_ENTRIES)
+            if settings.DOCUMENT_CACHE_DIR else None
+        )
+        self._llm_semaphore = asyncio.Semaphore(settings.MAX_CONCURRENCY)
+        self._health_status: Optional[dict] = None
+        self._health_checked_at = 0.0
+        self.answer_cache = AnswerCache(
+            max_size=settings.ANSWER_CACHE_SIZE,
+            ttl=settings.ANSWER_CACHE_TTL
+        )
+        self.response_cache = (
+            ResponseCache(max_size=settings.LLM_CACHE_SIZE, path=settings.LLM_CACHE_FILE)
+            if settings.LLM_CACHE_ENABLED else None
+        )
         self._initialize_gemini()
     
     def _initialize_gemini(self):
@@ -35,7 +58,7 @@ class QAService:
             self.client = None
             raise ValueError(f"Failed to initialize Gemini client: {str(e)}")
     
-    def _generate_answer(self, question: str, context: str) -> str:
+    async def _generate_answer(self, question: str, context: str) -> str:
         """
         Generate answer using Gemini Flash 1.5
         """
@@ -53,26 +76,43 @@ Question:
 
 Answer:"""
 
+            if self.response_cache is not None:
+                cached = self.response_cache.get(prompt)
+                if cached is not None:
+                    return cached
+            
             logger.info(f"Generating answer for question using Gemini")
             
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.1,  # Low temperature for consistent answers
-                    max_output_tokens=200,  # Reasonable limit for answers
+            # Bound in-flight Gemini calls across all requests to respect rate limits
+            async with self._llm_semaphore:
+                stream = await self.client.aio.models.generate_content_stream(
+                    model="gemini-2.5-flash",
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        temperature=0.1,  # Low temperature for consistent answers
+                        max_output_tokens=200,  # Reasonable limit for answers
+                    )
                 )
-            )
+                
+                text = ""
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        text += chunk.text or ""
+                        # The model replies with exactly this phrase when the context has no
+                        # answer; stop as soon as it appears instead of waiting for the rest
+                        if "Not found in document" in text:
+                            text = "Not found in document"
+                            break
             
-            if not response.text:
+            if not text:
                 logger.warning("Empty response from Gemini")
                 return ""
             
-            answer = response.text.strip()
+            # Clean up the answer: drop a leading "Answer:" the model sometimes echoes
+            answer = _ANSWER_PREFIX_RE.sub("", text, count=1).strip()
             
-            # Clean up the answer
-            if answer.lower().startswith("answer:"):
-                answer = answer[7:].strip()
+            if self.response_cache is not None and answer:
+                await self.response_cache.put(prompt, answer)
             
             logger.info("Answer generated successfully")
             return answer
@@ -81,6 +121,105 @@ Answer:"""
             logger.error(f"Failed to generate answer: {str(e)}")
             return "Not found in document"
     
+    async def _generate_answers_batch(self, questions: List[str], context: str) -> Optional[List[str]]:
+        """
+        Answer several questions over the same context in a single Gemini call.
+        Returns None if the response can't be matched up with the questions.
+        """
+        try:
+            numbered_questions = "\n".join(f"{n}. {q}" for n, q in enumerate(questions, 1))
+            prompt = f"""Answer each question using only the provided context.
+If an answer is not in the context, answer that question with "Not found in document".
+Do not add any explanations, citations, or additional information.
+Provide only the direct answers, as a JSON array of strings with one answer per question, in the same order.
+
+Context:
+{context}
+
+Questions:
+{numbered_questions}"""
+
+            if self.response_cache is not None:
+                cached = self.response_cache.get(prompt)
+                if cached is not None:
+                    return json.loads(cached)
+            
+            logger.info(f"Generating {len(questions)} answers in one Gemini call")
+            
+            async with self._llm_semaphore:
+                response = await self.client.aio.models.generate_content(
+                    model="gemini-2.5-flash",
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        temperature=0.1,  # Low temperature for consistent answers
+                        max_output_tokens=200 * len(questions),  # Same per-answer budget as single questions
+                        response_mime_type="application/json",
+                        response_schema=list[str],
+                    )
+                )
+            
+            answers = json.loads(response.text or "null")
+            if (
+                not isinstance(answers, list)
+                or len(answers) != len(questions)
+                or not all(isinstance(answer, str) for answer in answers)
+            ):
+                logger.warning("Batched Gemini response does not match the questions")
+                return None
+            
+            answers = [answer.strip() for answer in answers]
+            
+            if self.response_cache is not None:
+                await self.response_cache.put(prompt, json.dumps(answers))
+            
+            logger.info("Batched answers generated successfully")
+            return answers
+            
+        except Exception as e:
+            logger.error(f"Failed to generate batched answers: {str(e)}")
+            return None
+    
+    async def _get_document_index(self, url: str) -> KeywordIndex:
+        """
+        Get the search index for a document, reusing previously processed documents
+        """
+        key = document_key(url)
+        index = self.embedding_service.get_index(key)
+        
+        if index is not None:
+            logger.info("Document served from cache")
+            return index
+        
+        # Fall back to the on-disk cache, valid only while the server reports the same ETag
+        chunks = None
+        validator = None
+        if self.document_store is not None:
+            validator = await self.pdf_processor.fetch_validator(url)
+            if validator:
+                chunks = await asyncio.to_thread(self.document_store.load, url, validator)
+        
+        if chunks is None:
+            chunks = await self.pdf_processor.process_pdf(url)
+            if validator:
+                await asyncio.to_thread(self.document_store.save, url, validator, chunks)
+        
+        return self.embedding_service.create_vector_index(key, chunks)
+    
+    async def _answer_questions(self, questions: List[str], context: Optional[str]) -> List[str]:
+        """
+        Answer questions that share the same context, in a single Gemini call when there are several
+        """
+        if context is None:
+            return [""] * len(questions)
+        
+        if len(questions) > 1:
+            answers = await self._generate_answers_batch(questions, context)
+            if answers is not None:
+                return answers
+            logger.warning("Falling back to answering questions one by one")
+        
+        return await asyncio.gather(*[self._generate_answer(q, context) for q in questions])
+    
     async def process_qa_request(self, request: QARequest) -> QAResponse:
         """
         Process the complete QA request
@@ -88,56 +227,90 @@ Answer:"""
         try:
             logger.info(f"Processing QA request with {len(request.questions)} questions")
             
-            # Step 1: Process PDF
-            chunks = await self.pdf_processor.process_pdf(request.documents)
-            logger.info(f"PDF processed into {len(chunks)} chunks")
+            # Step 1: Serve previously answered questions from the cache
+            answers = [self.answer_cache.get(request.documents, q) for q in request.questions]
+            pending = [i for i, answer in enumerate(answers) if answer is None]
             
-            # Step 2: Create vector index
-            self.embedding_service.create_vector_index(chunks)
-            logger.info("Vector index created")
+            if not pending:
+                logger.info("All answers served from cache")
+                return QAResponse(answers=answers)
             
-            # Step 3: Process each question
-            answers = []
+            # Step 2: Process PDF and index it (or reuse the index if this document was seen recently)
+            index = await self._get_document_index(request.documents)
             
-            for i, question in enumerate(request.questions, 1):
-                try:
-                    logger.info(f"Processing question {i}/{len(request.questions)}")
-                    
-                    # Get relevant context
-                    context = self.embedding_service.get_context_for_question(
-                        question, 
-                        top_k=settings.TOP_K_CHUNKS
+            # Step 3: Retrieve context for all remaining questions in one batch. Prefer one
+            # context shared by all questions (a single Gemini call and prefill), unless it
+            # is over budget.
+            questions = [request.questions[i] for i in pending]
+            try:
+                shared_context = None
+                if len(questions) > 1:
+                    shared_context = self.embedding_service.get_shared_context(
+                        index,
+                        questions,
+                        top_k=settings.TOP_K_CHUNKS,
+                        max_words=settings.MAX_CONTEXT_WORDS
                     )
-                    
-                    # Generate answer
-                    answer = self._generate_answer(question, context)
-                    answers.append(answer)
-                    
-                    logger.info(f"Question {i} processed successfully")
-                    
-                except Exception as e:
-                    logger.error(f"Failed to process question {i}: {str(e)}")
-                    answers.append("")
-            
-            # Step 4: Clean up
-            self.embedding_service.clear_index()
+                
+                if shared_context is not None:
+                    contexts = dict.fromkeys(pending, shared_context)
+                else:
+                    contexts = dict(zip(pending, self.embedding_service.get_contexts_for_questions(
+                        index,
+                        questions,
+                        top_k=settings.TOP_K_CHUNKS
+                    )))
+            except Exception as e:
+                logger.error(f"Failed to retrieve context for questions: {str(e)}")
+                contexts = dict.fromkeys(pending)
+            
+            # Step 4: Group questions that share a context so each group needs one Gemini
+            # call, then answer all groups concurrently
+            groups: Dict[Optional[str], List[int]] = {}
+            for i in pending:
+                groups.setdefault(contexts[i], []).append(i)
+            
+            logger.info(f"Answering {len(pending)} questions in {len(groups)} groups")
+            results = await asyncio.gather(*[
+                self._answer_questions([request.questions[i] for i in indices], context)
+                for context, indices in groups.items()
+            ], return_exceptions=True)
+            
+            for indices, group_answers in zip(groups.values(), results):
+                if isinstance(group_answers, Exception):
+                    logger.error(f"Failed to process questions {[i + 1 for i in indices]}: {str(group_answers)}")
+                    group_answers = ["Not found in document"] * len(indices)
+                
+                for i, answer in zip(indices, group_answers):
+                    answers[i] = answer
+                    if answer and answer != "Not found in document":
+                        self.answer_cache.put(request.documents, request.questions[i], answer)
             
             logger.info(f"QA request completed with {len(answers)} answers")
             return QAResponse(answers=answers)
             
         except Exception as e:
             logger.error(f"QA request processing failed: {str(e)}")
-            # Clean up on error
-            self.embedding_service.clear_index()
             raise
     
-    def get_health_status(self) -> dict:
+    async def aclose(self) -> None:
+        """
+        Release network resources held by the service
         """
-        Get service health status
+        await self.pdf_processor.aclose()
+    
+    async def get_health_status(self) -> dict:
         """
+        Get service health status. The Gemini probe is cached for HEALTH_CHECK_TTL seconds
+        so frequent health polls don't each make a model call.
+        """
+        now = time.monotonic()
+        if self._health_status is not None and now - self._health_checked_at < settings.HEALTH_CHECK_TTL:
+            return self._health_status
+        
         try:
             # Test Gemini connection
-            test_response = self.client.models.generate_content(
+            test_response = await self.client.aio.models.generate_content(
                 model="gemini-2.5-flash",
                 contents="Say 'OK' if you can read this."
             )
@@ -148,9 +321,11 @@ Answer:"""
             logger.error(f"Gemini health check failed: {str(e)}")
             gemini_status = "unhealthy"
         
-        return {
+        self._health_status = {
             "pdf_processor": "healthy",
             "embedding_service": "healthy",
             "gemini_client": gemini_status,
             "overall": "healthy" if gemini_status == "healthy" else "unhealthy"
         }
+        self._health_checked_at = now
+        return self._health_status
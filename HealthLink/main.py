@@ -1,7 +1,8 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import router
+from app.api.routes import router, qa_service
 from app.core.config import settings
 import logging
 
@@ -11,10 +12,17 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close pooled HTTP connections on shutdown
+    await qa_service.aclose()
+
 app = FastAPI(
     title="HackRx 6.0 - Document QA API",
     description="Intelligent Document Question-Answering API using Gemini Flash 1.5",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -42,5 +50,7 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=5000,
-        reload=True
+        # Auto-reload only works with a single process
+        reload=settings.WORKERS == 1,
+        workers=settings.WORKERS
     )
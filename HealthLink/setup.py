@@ -13,10 +13,12 @@ setup(
     install_requires=[
         "fastapi>=0.116.1",
         "google-genai>=1.28.0",
+        "httptools>=0.6.4",
+        "httpx>=0.28.1",
         "pydantic-settings>=2.10.1",
         "pymupdf>=1.26.3",
-        "requests>=2.32.4",
         "uvicorn>=0.35.0",
+        "uvloop>=0.21.0; sys_platform != 'win32'",
     ],
     entry_points={
         "console_scripts": [
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from app.models.schemas import DocumentChunk
+from app.services import cache
+from app.services.cache import AnswerCache, DocumentStore, ResponseCache
+
+DOC = "https://example.com/policy.pdf"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", fake)
+    return fake
+
+# AnswerCache
+
+def test_answer_cache_matches_normalized_question():
+    answers = AnswerCache(max_size=10, ttl=300)
+    answers.put(DOC, "What is the  grace period?", "30 days")
+
+    assert answers.get(DOC, "what is the grace\tperiod?") == "30 days"
+
+def test_answer_cache_does_not_match_reworded_questions():
+    answers = AnswerCache(max_size=10, ttl=300)
+    answers.put(DOC, "Which expenses are covered under the hospitalization benefit of this policy?", "Room rent")
+    answers.put(DOC, "Does it cover home to hospital transfer?", "Yes")
+
+    assert answers.get(DOC, "Which expenses are not covered under the hospitalization benefit of this policy?") is None
+    assert answers.get(DOC, "Does it cover hospital to home transfer?") is None
+
+def test_answer_cache_is_scoped_per_document():
+    answers = AnswerCache(max_size=10, ttl=300)
+    answers.put(DOC, "What is the grace period?", "30 days")
+
+    assert answers.get("https://example.com/other.pdf", "What is the grace period?") is None
+
+def test_answer_cache_expires_entries(clock):
+    answers = AnswerCache(max_size=10, ttl=300)
+    answers.put(DOC, "What is the grace period?", "30 days")
+
+    clock.now += 300
+    assert answers.get(DOC, "What is the grace period?") == "30 days"
+    clock.now += 1
+    assert answers.get(DOC, "What is the grace period?") is None
+
+def test_answer_cache_evicts_least_recently_used():
+    answers = AnswerCache(max_size=2, ttl=300)
+    answers.put(DOC, "q1", "a1")
+    answers.put(DOC, "q2", "a2")
+    answers.get(DOC, "q1")
+    answers.put(DOC, "q3", "a3")
+
+    assert answers.get(DOC, "q1") == "a1"
+    assert answers.get(DOC, "q2") is None
+    assert answers.get(DOC, "q3") == "a3"
+
+# ResponseCache
+
+def test_response_cache_evicts_least_recently_used():
+    responses = ResponseCache(max_size=2)
+    asyncio.run(responses.put("p1", "r1"))
+    asyncio.run(responses.put("p2", "r2"))
+    responses.get("p1")
+    asyncio.run(responses.put("p3", "r3"))
+
+    assert responses.get("p1") == "r1"
+    assert responses.get("p2") is None
+    assert responses.get("p3") == "r3"
+
+def test_response_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / "llm" / "responses.jsonl")
+    asyncio.run(ResponseCache(max_size=10, path=path).put("prompt", "response"))
+
+    assert ResponseCache(max_size=10, path=path).get("prompt") == "response"
+
+def test_response_cache_skips_malformed_lines(tmp_path):
+    path = tmp_path / "responses.jsonl"
+    asyncio.run(ResponseCache(max_size=10, path=str(path)).put("prompt", "response"))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("not json\n")
+        f.write(json.dumps({"key": "missing response"}) + "\n")
+        f.write('{"key": "trunc')
+
+    responses = ResponseCache(max_size=10, path=str(path))
+
+    assert responses.get("prompt") == "response"
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 1
+
+def test_response_cache_compacts_file_to_max_size(tmp_path):
+    path = tmp_path / "responses.jsonl"
+    responses = ResponseCache(max_size=10, path=str(path))
+    for i in range(5):
+        asyncio.run(responses.put(f"p{i}", f"r{i}"))
+
+    compacted = ResponseCache(max_size=2, path=str(path))
+
+    assert compacted.get("p2") is None
+    assert compacted.get("p4") == "r4"
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+    assert os.listdir(tmp_path) == ["responses.jsonl"]
+
+# DocumentStore
+
+CHUNKS = [
+    DocumentChunk(content="grace period of thirty days", chunk_id=0, page_number=1),
+    DocumentChunk(content="waiting period of two years", chunk_id=1, page_number=2),
+]
+
+def test_document_store_round_trip(tmp_path):
+    store = DocumentStore(str(tmp_path), max_entries=10)
+    store.save(DOC, '"etag-1"', CHUNKS)
+
+    assert store.load(DOC, '"etag-1"') == CHUNKS
+
+def test_document_store_rejects_validator_mismatch(tmp_path):
+    store = DocumentStore(str(tmp_path), max_entries=10)
+    store.save(DOC, '"etag-1"', CHUNKS)
+
+    assert store.load(DOC, '"etag-2"') is None
+
+def test_document_store_missing_entry(tmp_path):
+    store = DocumentStore(str(tmp_path / "missing"), max_entries=10)
+
+    assert store.load(DOC, '"etag-1"') is None
+
+@pytest.mark.parametrize("content", [
+    "{not json",
+    json.dumps({"validator": '"etag-1"'}),
+    json.dumps({"validator": '"etag-1"', "chunks": [{"text": "wrong field"}]}),
+])
+def test_document_store_ignores_malformed_entries(tmp_path, content):
+    store = DocumentStore(str(tmp_path), max_entries=10)
+    store.save(DOC, '"etag-1"', CHUNKS)
+    with open(store._path(DOC), "w", encoding="utf-8") as f:
+        f.write(content)
+
+    assert store.load(DOC, '"etag-1"') is None
+
+def test_document_store_evicts_least_recently_used(tmp_path):
+    store = DocumentStore(str(tmp_path), max_entries=2)
+    urls = [f"https://example.com/{i}.pdf" for i in range(3)]
+
+    store.save(urls[0], "v", CHUNKS)
+    store.save(urls[1], "v", CHUNKS)
+    os.utime(store._path(urls[0]), (1, 1))
+    os.utime(store._path(urls[1]), (2, 2))
+    store.load(urls[0], "v")  # refreshes the first entry
+    store.save(urls[2], "v", CHUNKS)
+
+    assert store.load(urls[0], "v") == CHUNKS
+    assert store.load(urls[1], "v") is None
+    assert store.load(urls[2], "v") == CHUNKS
+    assert len(os.listdir(tmp_path)) == 2